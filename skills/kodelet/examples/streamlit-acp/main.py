@@ -19,13 +19,17 @@ This example explicitly uses the OpenAI provider with gpt-5.5.
 
 import asyncio
 import base64
+import functools
 import json
 import os
 import subprocess
 import sys
+from collections.abc import Mapping
 from datetime import datetime
 from shutil import which
+from types import MappingProxyType
 from typing import Any, cast
+from urllib.parse import quote
 
 import streamlit as st_module  # type: ignore[import-untyped]
 from acp import (  # type: ignore[import-not-found]
@@ -51,6 +55,7 @@ from acp.schema import (  # type: ignore[import-not-found]
     ToolCall,
     ToolCallProgress,
     ToolCallStart,
+    UserMessageChunk,
     WaitForTerminalExitResponse,
     WriteTextFileResponse,
 )
@@ -145,9 +150,27 @@ code, pre { font-family: 'Monaco', 'Menlo', 'Ubuntu Mono', monospace !important;
 </style>
 """
 
+# Single-pass HTML escaping for text interpolated into sidebar markup
+HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+CHAT_ITEM_TEMPLATE = (
+    '<li class="chat-item {active}">'
+    '<a href="?c={cid}" target="_top">'
+    '<div class="chat-preview">{preview}</div>'
+    '<div class="chat-date">{date}</div>'
+    '</a></li>'
+)
+
 
+@functools.cache
 def find_kodelet_binary() -> str:
-    """Find the kodelet binary in PATH."""
+    """Find the kodelet binary in PATH, resolving it once per process."""
     if path := which("kodelet"):
         return path
     st.error("Could not find `kodelet` in PATH. Please install it first.")
@@ -155,46 +178,63 @@ def find_kodelet_binary() -> str:
     raise SystemExit  # Unreachable, but satisfies type checker
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_conversations(limit: int) -> list[dict]:
+    """Fetch recent conversations from kodelet, raising on failure so errors aren't cached."""
+    result = subprocess.run(
+        [find_kodelet_binary(), "conversation", "list", "--limit", str(limit), "--json"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        timeout=5,
+        check=True,
+    )
+    # Parse raw bytes so json.loads detects UTF-8 rather than using the locale encoding
+    data = json.loads(result.stdout)
+    return data.get("conversations", [])
+
+
 def load_conversations(limit: int = 20) -> list[dict]:
     """Load recent conversations from kodelet."""
     try:
-        result = subprocess.run(
-            [find_kodelet_binary(), "conversation", "list", "--limit", str(limit), "--json"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            return data.get("conversations", [])
-    except (subprocess.TimeoutExpired, json.JSONDecodeError, FileNotFoundError):
-        pass
-    return []
+        return fetch_conversations(limit)
+    except (subprocess.SubprocessError, json.JSONDecodeError, FileNotFoundError):
+        return []
 
 
-class ACPClient(Client):
-    """ACP Client that streams responses to a Streamlit placeholder."""
+# Tool status -> icon; anything else (pending, in_progress, unknown) shows as running
+TOOL_STATUS_ICONS = {"completed": "✓", "failed": "✗"}
 
-    def __init__(self):
-        self.blocks: list[dict] = []
-        self.placeholder: Any = None
-        self.streaming = False
-        self.tool_state: dict[str, dict[str, Any]] = {}
 
-    def start_streaming(self):
-        """Reset accumulators and enable streaming."""
-        self.blocks = []
-        self.tool_state = {}
-        self.streaming = True
+# Shared read-only stand-in for a tool update that arrives before its start;
+# missing titles already fall back to the tool call id
+NO_TOOL_ENTRY: Mapping[str, Any] = MappingProxyType({})
+
+
+def format_tool_output(tc: dict) -> str:
+    """Format a tool entry's output for display."""
+    output = tc.get("output") or tc.get("result")
+    if not output:
+        return ""
+    return json.dumps(output, indent=2) if isinstance(output, dict) else str(output)
+
 
-    def _find_tool_entry(self, tool_call_id: str) -> dict | None:
-        for block in reversed(self.blocks):
-            if block["type"] != "tools":
-                continue
+def tool_output_text(tc: dict) -> str:
+    """Return a stored tool entry's display text, formatting it if it was never finalized."""
+    if "_output_text" in tc:
+        return tc["_output_text"]
+    return format_tool_output(tc)
+
+
+def finalize_tool_outputs(blocks: list[dict]):
+    """Format each tool's output once, so history reruns skip re-serializing it."""
+    for block in blocks:
+        if block["type"] == "tools":
             for tc in block["items"]:
-                if tc["id"] == tool_call_id:
-                    return tc
-        return None
+                tc["_output_text"] = format_tool_output(tc)
+
+
+class BaseClient(Client):
+    """ACP client that declines the file system, terminal and permission requests."""
 
     # Required ACP client methods (not implemented for this example)
     async def request_permission(self, options: list[PermissionOption], session_id: str, tool_call: ToolCall, **kwargs: Any) -> RequestPermissionResponse:
@@ -230,67 +270,155 @@ class ACPClient(Client):
     def on_connect(self, conn: Any) -> None:
         pass
 
+
+# Minimum delay between streaming re-renders, in seconds
+RENDER_INTERVAL = 0.05
+
+
+class ACPClient(BaseClient):
+    """ACP Client that streams responses to a Streamlit placeholder."""
+
+    def __init__(self):
+        self.blocks: list[dict] = []
+        self.placeholder: Any = None
+        self.slots_container: Any = None
+        self.slots: list[Any] = []
+        self.dirty: set[int] = set()
+        self.text_parts: list[str] = []
+        self.flush_handle: asyncio.TimerHandle | None = None
+        self.streaming = False
+        # tool_call_id -> (block index, tool entry) for constant-time updates
+        self.tool_entries: dict[str, tuple[int, dict[str, Any]]] = {}
+        # Dispatch on the sessionUpdate tag instead of walking an isinstance chain
+        self.update_handlers: dict[str, Any] = {
+            "agent_thought_chunk": self._on_thought_chunk,
+            "agent_message_chunk": self._on_message_chunk,
+            "tool_call": self._on_tool_call_start,
+            "tool_call_update": self._on_tool_call_progress,
+        }
+
+    def start_streaming(self):
+        """Reset accumulators and enable streaming."""
+        self.blocks = []
+        self.slots_container = None
+        self.slots = []
+        self.dirty = set()
+        self.text_parts = []
+        self.tool_entries = {}
+        self.streaming = True
+
+    def _append_tool(self, tool_entry: dict[str, Any]):
+        """Start a tools block for a new tool call and index it by call id."""
+        self._append_block({"type": "tools", "items": [tool_entry]})
+        self.tool_entries[tool_entry["id"]] = (len(self.blocks) - 1, tool_entry)
+
+    def _mark_dirty(self, *indices: int):
+        """Queue blocks for re-rendering, coalescing chunks into one flush per interval."""
+        self.dirty.update(indices)
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(RENDER_INTERVAL, self.flush)
+
+    def flush(self):
+        """Render every block changed since the last flush."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        self._join_text()
+        if self.dirty:
+            self._render(*sorted(self.dirty))
+            self.dirty.clear()
+
+    def _join_text(self):
+        """Fold buffered text chunks into the content of the last block."""
+        if len(self.text_parts) > 1:
+            content = "".join(self.text_parts)
+            self.blocks[-1]["content"] = content
+            self.text_parts = [content]
+
+    def _extend_text(self, block_type: str, text: str):
+        """Buffer a text chunk, starting a new block when the block type changes."""
+        if self.blocks and self.blocks[-1]["type"] == block_type:
+            self.text_parts.append(text)
+            self._mark_dirty(len(self.blocks) - 1)
+        else:
+            self._append_block({"type": block_type, "content": text})
+            self.text_parts = [text]
+
+    def _append_block(self, block: dict):
+        """Append a block and queue it along with any thinking block it follows."""
+        self._join_text()
+        self.text_parts = []
+        self.blocks.append(block)
+        index = len(self.blocks) - 1
+        # A thinking block collapses once later content arrives
+        if index > 0 and self.blocks[index - 1]["type"] == "thinking":
+            self._mark_dirty(index - 1, index)
+        else:
+            self._mark_dirty(index)
+
     async def session_update(self, session_id: str, update: Any, **kwargs: Any) -> None:
         if not self.streaming:
             return
-
-        if isinstance(update, AgentThoughtChunk) and isinstance(update.content, TextContentBlock):
-            if self.blocks and self.blocks[-1]["type"] == "thinking":
-                self.blocks[-1]["content"] += update.content.text
-            else:
-                self.blocks.append({"type": "thinking", "content": update.content.text})
-            self._render()
-
-        elif isinstance(update, AgentMessageChunk) and isinstance(update.content, TextContentBlock):
-            if self.blocks and self.blocks[-1]["type"] == "message":
-                self.blocks[-1]["content"] += update.content.text
-            else:
-                self.blocks.append({"type": "message", "content": update.content.text})
-            self._render()
-
-        elif isinstance(update, ToolCallStart):
-            existing = self._find_tool_entry(update.tool_call_id)
-            if existing:
-                existing["title"] = update.title or existing.get("title")
-                existing["status"] = update.status if update.status is not None else existing.get("status")
-                if update.raw_output is not None:
-                    existing["output"] = update.raw_output
-                self.tool_state[update.tool_call_id] = dict(existing)
-            else:
-                tool_entry = {
-                    "id": update.tool_call_id,
-                    "title": update.title,
-                    "status": update.status,
-                    "output": update.raw_output,
-                }
-                self.tool_state[update.tool_call_id] = dict(tool_entry)
-                self.blocks.append({"type": "tools", "items": [tool_entry]})
-            self._render()
-
-        elif isinstance(update, ToolCallProgress):
-            previous = self.tool_state.get(update.tool_call_id, {"id": update.tool_call_id, "title": update.tool_call_id})
-            tool_entry = {
+        handler = self.update_handlers.get(update.session_update)
+        if handler:
+            handler(update)
+
+    def _on_thought_chunk(self, update: AgentThoughtChunk):
+        if isinstance(update.content, TextContentBlock):
+            self._extend_text("thinking", update.content.text)
+
+    def _on_message_chunk(self, update: AgentMessageChunk):
+        if isinstance(update.content, TextContentBlock):
+            self._extend_text("message", update.content.text)
+
+    def _on_tool_call_start(self, update: ToolCallStart):
+        found = self.tool_entries.get(update.tool_call_id)
+        if found:
+            index, existing = found
+            existing["title"] = update.title or existing.get("title")
+            existing["status"] = update.status if update.status is not None else existing.get("status")
+            if update.raw_output is not None:
+                existing["output"] = update.raw_output
+            self._mark_dirty(index)
+        else:
+            self._append_tool({
                 "id": update.tool_call_id,
-                "title": getattr(update, "title", None) or previous.get("title") or update.tool_call_id,
-                "status": update.status if getattr(update, "status", None) is not None else previous.get("status"),
-                "output": update.raw_output if update.raw_output is not None else previous.get("output"),
-            }
-            self.tool_state[update.tool_call_id] = dict(tool_entry)
-            existing = self._find_tool_entry(update.tool_call_id)
-            if existing:
-                existing.update(tool_entry)
-            else:
-                self.blocks.append({"type": "tools", "items": [tool_entry]})
-            self._render()
-
-    def _render(self):
-        """Render current state to the placeholder, preserving turn order."""
+                "title": update.title,
+                "status": update.status,
+                "output": update.raw_output,
+            })
+
+    def _on_tool_call_progress(self, update: ToolCallProgress):
+        found = self.tool_entries.get(update.tool_call_id)
+        previous = found[1] if found else NO_TOOL_ENTRY
+        tool_entry = {
+            "id": update.tool_call_id,
+            "title": update.title or previous.get("title") or update.tool_call_id,
+            "status": update.status if update.status is not None else previous.get("status"),
+            "output": update.raw_output if update.raw_output is not None else previous.get("output"),
+        }
+        if found:
+            index, existing = found
+            existing.update(tool_entry)
+            self._mark_dirty(index)
+        else:
+            self._append_tool(tool_entry)
+
+    def _render(self, *indices: int):
+        """Re-render the given blocks in place, each in its own placeholder slot."""
         if not self.placeholder:
             return
-        with self.placeholder.container():
-            for i, block in enumerate(self.blocks):
+        if self.slots_container is None:
+            self.slots_container = self.placeholder.container()
+        while len(self.slots) < len(self.blocks):
+            self.slots.append(self.slots_container.empty())
+        last_index = len(self.blocks) - 1
+        for i in indices:
+            block = self.blocks[i]
+            with self.slots[i].container():
                 if block["type"] == "thinking":
-                    has_later_content = any(b["type"] != "thinking" for b in self.blocks[i + 1:])
+                    # Thinking blocks are merged, so anything after one is other content
+                    has_later_content = i < last_index
                     label = "Thinking" if has_later_content else "Thinking..."
                     with st.expander(label, expanded=not has_later_content):
                         st.markdown(block["content"])
@@ -298,27 +426,26 @@ class ACPClient(Client):
                     items = block["items"]
                     with st.expander(f"Tools ({len(items)})", expanded=False):
                         for j, tc in enumerate(items):
-                            if tc.get("status") in ("completed",):
-                                icon = "✓"
-                            elif tc.get("status") == "failed":
-                                icon = "✗"
-                            else:
-                                icon = "⏳"
+                            icon = TOOL_STATUS_ICONS.get(tc["status"], "⏳")
                             st.write(f"**{j + 1}. {icon} {tc['title']}**")
-                            if tc.get("output"):
-                                output = tc["output"]
-                                st.code(json.dumps(output, indent=2) if isinstance(output, dict) else str(output))
+                            if output_text := format_tool_output(tc):
+                                st.code(output_text)
                 elif block["type"] == "message":
                     st.markdown(block["content"])
 
     def get_result(self) -> dict:
         """Return accumulated result as a message dict with ordered blocks."""
+        self._join_text()
+        finalize_tool_outputs(self.blocks)
         return {"role": "assistant", "blocks": self.blocks}
 
 
 # 50MB buffer limit for large conversation history
 ACP_BUFFER_LIMIT = 50 * 1024 * 1024
 
+# Arguments for launching kodelet as an ACP agent
+ACP_AGENT_ARGS = ("acp", "--provider", DEFAULT_PROVIDER, "--model", DEFAULT_MODEL)
+
 
 def supports_load_session(init_response: Any) -> bool:
     agent_capabilities = getattr(init_response, "agent_capabilities", None)
@@ -338,10 +465,11 @@ async def run_acp_prompt(
     query: str,
     placeholder: Any,
     session_id: str | None = None,
-    images: list[Any] | None = None,
+    images: list[dict] | None = None,
 ) -> tuple[dict, str | None]:
     """Run a prompt via ACP and stream results. Returns (result_dict, session_id)."""
     kodelet_path = find_kodelet_binary()
+    cwd = os.getcwd()
     client = ACPClient()
     client.placeholder = placeholder
     result_session_id = session_id
@@ -350,11 +478,7 @@ async def run_acp_prompt(
         async with spawn_agent_process(
             client,
             kodelet_path,
-            "acp",
-            "--provider",
-            DEFAULT_PROVIDER,
-            "--model",
-            DEFAULT_MODEL,
+            *ACP_AGENT_ARGS,
             transport_kwargs={"limit": ACP_BUFFER_LIMIT},
         ) as (conn, _):
             init_resp = await conn.initialize(protocol_version=PROTOCOL_VERSION, client_capabilities={})
@@ -363,14 +487,14 @@ async def run_acp_prompt(
             # Load or create session
             if session_id and can_load_session:
                 try:
-                    await conn.load_session(session_id=session_id, cwd=os.getcwd())
+                    await conn.load_session(session_id=session_id, cwd=cwd)
                     await asyncio.sleep(0)  # Yield to let history callbacks complete
                     result_session_id = session_id
                 except Exception:
-                    session = await conn.new_session(cwd=os.getcwd())
+                    session = await conn.new_session(cwd=cwd)
                     result_session_id = session.session_id
             else:
-                session = await conn.new_session(cwd=os.getcwd())
+                session = await conn.new_session(cwd=cwd)
                 result_session_id = session.session_id
 
             # Build prompt and stream response
@@ -378,8 +502,7 @@ async def run_acp_prompt(
             prompt_blocks: list[Any] = []
             if images:
                 for img in images:
-                    img_data = base64.b64encode(img.read()).decode("utf-8")
-                    prompt_blocks.append(image_block(img_data, img.type))
+                    prompt_blocks.append(image_block(img["data"], img["type"]))
             if query:
                 prompt_blocks.append(text_block(query))
             await conn.prompt(session_id=result_session_id, prompt=prompt_blocks)
@@ -387,6 +510,7 @@ async def run_acp_prompt(
     except Exception as e:
         st.error(f"ACP error: {e}")
 
+    client.flush()
     return client.get_result(), result_session_id
 
 
@@ -402,16 +526,10 @@ def render_assistant_message(msg: dict):
                 with st.expander(f"Tools ({len(items)})", expanded=False):
                     for i, tc in enumerate(items):
                         title = tc.get("title") or tc.get("name", "Tool")
-                        if tc.get("status") in ("completed",):
-                            icon = "✓"
-                        elif tc.get("status") == "failed":
-                            icon = "✗"
-                        else:
-                            icon = "⏳"
+                        icon = TOOL_STATUS_ICONS.get(tc.get("status"), "⏳")
                         st.write(f"**{i + 1}. {icon} {title}**")
-                        if tc.get("output") or tc.get("result"):
-                            output = tc.get("output") or tc.get("result")
-                            st.code(json.dumps(output, indent=2) if isinstance(output, dict) else str(output))
+                        if output_text := tool_output_text(tc):
+                            st.code(output_text)
             elif block["type"] == "message":
                 st.markdown(block["content"])
         return
@@ -424,141 +542,135 @@ def render_assistant_message(msg: dict):
             for i, tc in enumerate(msg["tools"]):
                 title = tc.get("title") or tc.get("name", "Tool")
                 st.write(f"**{i + 1}. ✓ {title}**")
-                if tc.get("output") or tc.get("result"):
-                    output = tc.get("output") or tc.get("result")
-                    st.code(json.dumps(output, indent=2) if isinstance(output, dict) else str(output))
+                if output_text := tool_output_text(tc):
+                    st.code(output_text)
     st.markdown(msg.get("content", ""))
 
 
+class HistoryClient(BaseClient):
+    """Minimal client that records history from session/load."""
+
+    def __init__(self):
+        self.messages: list[dict] = []
+        self.current_msg: dict | None = None
+        # Chunks of the text block at the tail of the current message, joined lazily
+        self.text_block: dict | None = None
+        self.text_parts: list[str] = []
+        # tool_call_id -> tool entry for the current turn
+        self.current_tools: dict[str, dict[str, Any]] = {}
+        # Same sessionUpdate tag dispatch as ACPClient; unrecorded kinds have no handler
+        self.update_handlers: dict[str, Any] = {
+            "user_message_chunk": self._on_user_chunk,
+            "agent_thought_chunk": self._on_thought_chunk,
+            "agent_message_chunk": self._on_message_chunk,
+            "tool_call": self._on_tool_call_start,
+            "tool_call_update": self._on_tool_call_progress,
+        }
+
+    async def session_update(self, session_id: str, update: Any, **kwargs: Any) -> None:
+        handler = self.update_handlers.get(update.session_update)
+        if handler:
+            handler(update)
+
+    def get_messages(self) -> list[dict]:
+        """Return the recorded messages, including the turn still in progress."""
+        self._finish_message()
+        for msg in self.messages:
+            if msg["role"] == "assistant":
+                finalize_tool_outputs(msg["blocks"])
+        return self.messages
+
+    def _join_text(self):
+        """Fold buffered text chunks into the tail text block."""
+        if self.text_block is not None and len(self.text_parts) > 1:
+            self.text_block["content"] = "".join(self.text_parts)
+        self.text_block = None
+        self.text_parts = []
+
+    def _finish_message(self):
+        """Move the current message, if any, into the recorded messages."""
+        self._join_text()
+        if self.current_msg:
+            self.messages.append(self.current_msg)
+        self.current_msg = None
+
+    def _assistant_blocks(self) -> list[dict]:
+        """Return the blocks of the current assistant message, starting one if needed."""
+        if self.current_msg is None or self.current_msg["role"] != "assistant":
+            self._finish_message()
+            self.current_msg = {"role": "assistant", "blocks": []}
+        return self.current_msg["blocks"]
+
+    def _on_user_chunk(self, update: UserMessageChunk):
+        # User message = new turn
+        if isinstance(update.content, TextContentBlock):
+            self._finish_message()
+            self.current_msg = {"role": "user", "content": update.content.text}
+            self.current_tools = {}
+
+    def _on_thought_chunk(self, update: AgentThoughtChunk):
+        blocks = self._assistant_blocks()
+        if isinstance(update.content, TextContentBlock):
+            self._extend_text(blocks, "thinking", update.content.text)
+
+    def _on_message_chunk(self, update: AgentMessageChunk):
+        blocks = self._assistant_blocks()
+        if isinstance(update.content, TextContentBlock):
+            self._extend_text(blocks, "message", update.content.text)
+
+    def _extend_text(self, blocks: list[dict], block_type: str, text: str):
+        """Buffer a text chunk, starting a new block when the block type changes."""
+        if self.text_block is not None and self.text_block["type"] == block_type:
+            self.text_parts.append(text)
+        else:
+            self._join_text()
+            self.text_block = {"type": block_type, "content": text}
+            self.text_parts = [text]
+            blocks.append(self.text_block)
+
+    def _on_tool_call_start(self, update: ToolCallStart):
+        blocks = self._assistant_blocks()
+        tool_entry = {
+            "id": update.tool_call_id,
+            "title": update.title,
+            "status": update.status,
+            "output": update.raw_output,
+        }
+        if existing := self.current_tools.get(update.tool_call_id):
+            existing.update(tool_entry)
+        else:
+            self.current_tools[update.tool_call_id] = tool_entry
+            self._join_text()
+            blocks.append({"type": "tools", "items": [tool_entry]})
+
+    def _on_tool_call_progress(self, update: ToolCallProgress):
+        blocks = self._assistant_blocks()
+        existing = self.current_tools.get(update.tool_call_id)
+        previous = existing or NO_TOOL_ENTRY
+        tool_entry = {
+            "id": update.tool_call_id,
+            "title": update.title or previous.get("title") or update.tool_call_id,
+            "status": update.status if update.status is not None else previous.get("status"),
+            "output": update.raw_output if update.raw_output is not None else previous.get("output"),
+        }
+        if existing:
+            existing.update(tool_entry)
+        else:
+            self.current_tools[update.tool_call_id] = tool_entry
+            self._join_text()
+            blocks.append({"type": "tools", "items": [tool_entry]})
+
+
 async def load_history_via_acp(session_id: str) -> list[dict]:
     """Load conversation history via ACP session/load."""
     kodelet_path = find_kodelet_binary()
-    messages: list[dict] = []
-    current_msg: dict | None = None
-    current_tool_state: dict[str, dict[str, Any]] = {}
-
-    class HistoryClient(Client):
-        """Minimal client that records history from session/load."""
-
-        async def request_permission(self, *args: Any, **kwargs: Any) -> RequestPermissionResponse:
-            raise RequestError.method_not_found("session/request_permission")
-
-        async def write_text_file(self, *args: Any, **kwargs: Any) -> WriteTextFileResponse | None:
-            raise RequestError.method_not_found("fs/write_text_file")
-
-        async def read_text_file(self, *args: Any, **kwargs: Any) -> ReadTextFileResponse:
-            raise RequestError.method_not_found("fs/read_text_file")
-
-        async def create_terminal(self, *args: Any, **kwargs: Any) -> CreateTerminalResponse:
-            raise RequestError.method_not_found("terminal/create")
-
-        async def terminal_output(self, *args: Any, **kwargs: Any) -> TerminalOutputResponse:
-            raise RequestError.method_not_found("terminal/output")
-
-        async def release_terminal(self, *args: Any, **kwargs: Any) -> ReleaseTerminalResponse | None:
-            raise RequestError.method_not_found("terminal/release")
-
-        async def wait_for_terminal_exit(self, *args: Any, **kwargs: Any) -> WaitForTerminalExitResponse:
-            raise RequestError.method_not_found("terminal/wait_for_exit")
-
-        async def kill_terminal(self, *args: Any, **kwargs: Any) -> KillTerminalCommandResponse | None:
-            raise RequestError.method_not_found("terminal/kill")
-
-        async def ext_method(self, method: str, params: dict) -> dict:
-            raise RequestError.method_not_found(method)
-
-        async def ext_notification(self, method: str, params: dict) -> None:
-            pass
-
-        def on_connect(self, conn: Any) -> None:
-            pass
-
-        async def session_update(self, session_id: str, update: Any, **kwargs: Any) -> None:
-            nonlocal current_msg
-
-            from acp.schema import UserMessageChunk  # type: ignore[import-not-found]
-
-            # User message = new turn
-            if isinstance(update, UserMessageChunk) and isinstance(update.content, TextContentBlock):
-                if current_msg:
-                    messages.append(current_msg)
-                current_msg = {"role": "user", "content": update.content.text}
-                current_tool_state = {}
-                return
-
-            # Agent content - ensure we have an assistant message with blocks
-            if current_msg is None or current_msg["role"] != "assistant":
-                if current_msg:
-                    messages.append(current_msg)
-                current_msg = {"role": "assistant", "blocks": []}
-
-            blocks = current_msg["blocks"]
-
-            if isinstance(update, AgentThoughtChunk) and isinstance(update.content, TextContentBlock):
-                if blocks and blocks[-1]["type"] == "thinking":
-                    blocks[-1]["content"] += update.content.text
-                else:
-                    blocks.append({"type": "thinking", "content": update.content.text})
-            elif isinstance(update, AgentMessageChunk) and isinstance(update.content, TextContentBlock):
-                if blocks and blocks[-1]["type"] == "message":
-                    blocks[-1]["content"] += update.content.text
-                else:
-                    blocks.append({"type": "message", "content": update.content.text})
-            elif isinstance(update, ToolCallStart):
-                tool_entry = {
-                    "id": update.tool_call_id,
-                    "title": update.title,
-                    "status": getattr(update, "status", None),
-                    "output": update.raw_output,
-                }
-                current_tool_state[update.tool_call_id] = dict(tool_entry)
-                existing = None
-                for blk in reversed(blocks):
-                    if blk["type"] != "tools":
-                        continue
-                    for tc in blk["items"]:
-                        if tc["id"] == update.tool_call_id:
-                            existing = tc
-                            break
-                    if existing:
-                        break
-                if existing:
-                    existing.update(tool_entry)
-                else:
-                    blocks.append({"type": "tools", "items": [tool_entry]})
-            elif isinstance(update, ToolCallProgress):
-                previous = current_tool_state.get(update.tool_call_id, {"id": update.tool_call_id, "title": update.tool_call_id})
-                tool_entry = {
-                    "id": update.tool_call_id,
-                    "title": getattr(update, "title", None) or previous.get("title") or update.tool_call_id,
-                    "status": update.status if getattr(update, "status", None) is not None else previous.get("status"),
-                    "output": update.raw_output if update.raw_output is not None else previous.get("output"),
-                }
-                current_tool_state[update.tool_call_id] = dict(tool_entry)
-                existing = None
-                for blk in reversed(blocks):
-                    if blk["type"] != "tools":
-                        continue
-                    for tc in blk["items"]:
-                        if tc["id"] == update.tool_call_id:
-                            existing = tc
-                            break
-                    if existing:
-                        break
-                if existing:
-                    existing.update(tool_entry)
-                else:
-                    blocks.append({"type": "tools", "items": [tool_entry]})
+    client = HistoryClient()
 
     try:
         async with spawn_agent_process(
-            HistoryClient(),
+            client,
             kodelet_path,
-            "acp",
-            "--provider",
-            DEFAULT_PROVIDER,
-            "--model",
-            DEFAULT_MODEL,
+            *ACP_AGENT_ARGS,
             transport_kwargs={"limit": ACP_BUFFER_LIMIT},
         ) as (conn, _):
             init_resp = await conn.initialize(protocol_version=PROTOCOL_VERSION, client_capabilities={})
@@ -566,12 +678,10 @@ async def load_history_via_acp(session_id: str) -> list[dict]:
                 return []
             await conn.load_session(session_id=session_id, cwd=os.getcwd())
             await asyncio.sleep(0)  # Yield to ensure all callbacks complete
-            if current_msg:
-                messages.append(current_msg)
     except Exception:
         return []
 
-    return messages
+    return client.get_messages()
 
 
 def main():
@@ -613,6 +723,9 @@ def main():
         text = prompt.text if hasattr(prompt, "text") else str(prompt)
         files = prompt.files if hasattr(prompt, "files") else []
 
+        # Encode attachments once for both the ACP prompt and the stored history
+        images = [{"data": base64.b64encode(f.getvalue()).decode("utf-8"), "type": f.type} for f in files]
+
         with st.chat_message("user"):
             for f in files:
                 st.image(f)
@@ -621,16 +734,19 @@ def main():
 
         with st.chat_message("assistant"):
             placeholder = st.empty()
-            result, new_session_id = asyncio.run(run_acp_prompt(text, placeholder, st.session_state.session_id, images=files if files else None))
+            result, new_session_id = asyncio.run(run_acp_prompt(text, placeholder, st.session_state.session_id, images=images or None))
 
         if new_session_id:
             st.session_state.session_id = new_session_id
             st.query_params["c"] = new_session_id
 
+        # The prompt updated (or created) a conversation, so refresh the sidebar list
+        fetch_conversations.clear()
+
         # Store messages in session state
         user_msg: dict[str, Any] = {"role": "user", "content": text}
-        if files:
-            user_msg["images"] = [{"data": base64.b64encode(f.getvalue()).decode("utf-8"), "type": f.type} for f in files]
+        if images:
+            user_msg["images"] = images
         st.session_state.messages.append(user_msg)
         st.session_state.messages.append(result)
 
@@ -649,18 +765,17 @@ def main():
         chat_items = []
         for convo in conversations:
             cid = convo.get("id", "")
-            preview = convo.get("preview", "No preview")[:50]
-            if len(convo.get("preview", "")) > 50:
-                preview += "..."
+            preview = convo.get("preview", "No preview")
+            if len(preview) > 50:
+                preview = preview[:50] + "..."
             date = convo.get("updated_at", "")[:10]
             is_active = "active" if cid == st.session_state.session_id else ""
-            chat_items.append(
-                f'<li class="chat-item {is_active}">'
-                f'<a href="?c={cid}" target="_top">'
-                f'<div class="chat-preview">{preview}</div>'
-                f'<div class="chat-date">{date}</div>'
-                f'</a></li>'
-            )
+            chat_items.append(CHAT_ITEM_TEMPLATE.format(
+                active=is_active,
+                cid=quote(cid, safe=""),
+                preview=preview.translate(HTML_ESCAPE_TABLE),
+                date=date.translate(HTML_ESCAPE_TABLE),
+            ))
         st.markdown(f'<ul class="chat-list">{"".join(chat_items)}</ul>', unsafe_allow_html=True)
 
 